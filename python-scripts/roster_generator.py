@@ -4,13 +4,256 @@ from datetime import datetime, timedelta
 import random
 import os
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-// pages/api/roster/generate.js
+import sys
+import time
+import json
+
+
+def run_stage(executor, function, *args, **kwargs):
+    """Submit a pipeline stage to executor, or run it inline when executor is None"""
+    if executor is not None:
+        return executor.submit(function, *args, **kwargs)
+    future = Future()
+    future.set_result(function(*args, **kwargs))
+    return future
+
+
+class EmployeeRecord:
+    """Lightweight view of one employee in an EmployeeRegistry"""
+    __slots__ = ('index', 'employee_id', 'employee_name', 'department', 'position', 'two_shift')
+
+    def __init__(self, index, employee_id, employee_name, department, position, two_shift):
+        self.index = index
+        self.employee_id = employee_id
+        self.employee_name = employee_name
+        self.department = department
+        self.position = position
+        self.two_shift = two_shift
+
+
+class EmployeeRegistry:
+    """
+    Employee attributes held as parallel arrays, built once after loading.
+    Departments and positions are stored as integer category codes.
+    """
+
+    def __init__(self, employees_df, two_shift_departments):
+        total = len(employees_df)
+
+        def column_values(column, default):
+            if column in employees_df.columns:
+                return employees_df[column].astype(str).to_numpy()
+            return np.array([default(i) for i in range(total)], dtype=object)
+
+        self.employee_ids = np.asarray(column_values('Employee_ID', lambda i: f'EMP{i + 1:04d}'), dtype=str)
+        self.employee_names = np.asarray(column_values('Employee_Name', lambda i: f'Employee {i + 1}'), dtype=str)
+
+        department_codes, department_names = pd.factorize(column_values('Department', lambda i: 'General'))
+        self.department_codes = department_codes.astype(np.int32)
+        self.department_names = [str(name) for name in department_names]
+
+        position_codes, position_names = pd.factorize(column_values('Position', lambda i: 'Staff'))
+        self.position_codes = position_codes.astype(np.int32)
+        self.position_names = [str(name) for name in position_names]
+
+        two_shift_codes = [code for code, name in enumerate(self.department_names) if name in two_shift_departments]
+        self.two_shift = np.isin(self.department_codes, two_shift_codes)
+
+    def __len__(self):
+        return len(self.employee_ids)
+
+    def department(self, emp_idx):
+        return self.department_names[self.department_codes[emp_idx]]
+
+    def position(self, emp_idx):
+        return self.position_names[self.position_codes[emp_idx]]
+
+    def record(self, emp_idx):
+        return EmployeeRecord(emp_idx, str(self.employee_ids[emp_idx]), str(self.employee_names[emp_idx]),
+                              self.department(emp_idx), self.position(emp_idx), bool(self.two_shift[emp_idx]))
+
+    def memory_usage(self):
+        """Approximate memory footprint in bytes"""
+        arrays = [self.employee_ids, self.employee_names, self.department_codes, self.position_codes, self.two_shift]
+        names = self.department_names + self.position_names
+        return sum(array.nbytes for array in arrays) + sum(sys.getsizeof(name) for name in names)
+
+
+class RosterArchive:
+    """
+    Append-only archive of monthly rosters on disk.
+    Each month is a (days, employees) int8 shift-code matrix saved as .npy and read back
+    memory-mapped; columns index an append-only employee-ID dictionary. Re-archiving a
+    month adds a new generation, and queries use the latest generation of each month.
+    """
+
+    def __init__(self, archive_dir, shift_codes=None):
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.archive_dir / 'manifest.json'
+        self.ids_path = self.archive_dir / 'employee_ids.txt'
+
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding='utf-8') as manifest_file:
+                self.manifest = json.load(manifest_file)
+        else:
+            if shift_codes is None:
+                raise ValueError("shift_codes are required to create a new archive")
+            self.manifest = {'shift_codes': list(shift_codes), 'months': []}
+        self.shift_codes = self.manifest['shift_codes']
+
+        self.employee_ids = []
+        if self.ids_path.exists():
+            with open(self.ids_path, encoding='utf-8') as ids_file:
+                self.employee_ids = ids_file.read().splitlines()
+        self.employee_keys = {employee_id: key for key, employee_id in enumerate(self.employee_ids)}
+
+    def _write_manifest(self):
+        temp_path = self.manifest_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    def get_employee_keys(self, employee_ids):
+        """Dictionary keys for employee_ids, appending any new IDs to the dictionary"""
+        new_ids = []
+        for employee_id in employee_ids:
+            if employee_id not in self.employee_keys:
+                self.employee_keys[employee_id] = len(self.employee_ids)
+                self.employee_ids.append(employee_id)
+                new_ids.append(employee_id)
+        if new_ids:
+            with open(self.ids_path, 'a', encoding='utf-8') as ids_file:
+                ids_file.write(''.join(f"{employee_id}\n" for employee_id in new_ids))
+        return np.array([self.employee_keys[employee_id] for employee_id in employee_ids], dtype=np.int64)
+
+    def add_month(self, year, month, dates, employee_ids, codes):
+        """Append one month; codes is an (employees, days) int8 matrix in this archive's shift codes"""
+        employee_ids = [str(employee_id) for employee_id in employee_ids]
+        codes = np.asarray(codes, dtype=np.int8)
+        # -1 is reserved for days an employee is not rostered, so unknown shift values are stored separately
+        unknown = codes < 0
+        if unknown.any():
+            if 'ERROR_NO_SCHEDULE' in self.shift_codes:
+                codes = np.where(unknown, self.shift_codes.index('ERROR_NO_SCHEDULE'), codes).astype(np.int8)
+                print(f"WARNING: {int(unknown.sum())} cells with unknown shift values archived as ERROR_NO_SCHEDULE")
+            else:
+                print(f"WARNING: {int(unknown.sum())} cells with unknown shift values archived as not rostered")
+        keys = self.get_employee_keys(employee_ids)
+        generation = 1 + max([entry['generation'] for entry in self.manifest['months']
+                              if entry['year'] == year and entry['month'] == month], default=0)
+        file_name = f"roster_{year}_{month:02d}_g{generation}.npy"
+
+        # Day-major layout: one contiguous row per day, one column per dictionary key (-1 = not rostered)
+        matrix = np.lib.format.open_memmap(self.archive_dir / file_name, mode='w+', dtype=np.int8,
+                                           shape=(len(dates), len(self.employee_ids)))
+        matrix[:] = -1
+        matrix[:, keys] = codes.T
+        matrix.flush()
+        del matrix
+
+        self.manifest['months'].append({
+            'year': year,
+            'month': month,
+            'generation': generation,
+            'file': file_name,
+            'dates': [date.strftime('%Y-%m-%d') for date in dates],
+            'employees': len(self.employee_ids)
+        })
+        self._write_manifest()
+        print(f"Archived {year}-{month:02d} (generation {generation}, {len(employee_ids)} employees)")
+        return file_name
+
+    def latest_months(self, start=None, end=None):
+        """Latest generation of each archived month, in date order; start/end are (year, month) tuples"""
+        latest = {}
+        for entry in self.manifest['months']:
+            period = (entry['year'], entry['month'])
+            if (start is None or period >= start) and (end is None or period <= end):
+                if period not in latest or entry['generation'] > latest[period]['generation']:
+                    latest[period] = entry
+        return [latest[period] for period in sorted(latest)]
+
+    def load_month(self, entry):
+        return np.load(self.archive_dir / entry['file'], mmap_mode='r')
+
+    def has_month(self, year, month):
+        return any(entry['year'] == year and entry['month'] == month for entry in self.manifest['months'])
+
+    def count_month_codes(self, matrix, per_employee, chunk_employees=4096):
+        """
+        Counts of every shift code over a mapped month matrix, read chunk_employees columns at a time.
+        Returns (codes + 1, employees) when per_employee, else (days, codes + 1); slot 0 is -1.
+        """
+        num_codes = len(self.shift_codes) + 1
+        num_days, num_employees = matrix.shape
+        counts = np.zeros((num_codes, num_employees) if per_employee else (num_days, num_codes), dtype=np.int64)
+        # Bin indices per (code, employee) or (day, code), written into one reused scratch buffer
+        scratch = np.empty((num_days, min(chunk_employees, num_employees)), dtype=np.intp)
+        day_bins = np.arange(num_days)[:, None] * num_codes
+        for first_employee in range(0, num_employees, chunk_employees):
+            columns = matrix[:, first_employee:first_employee + chunk_employees]
+            width = columns.shape[1]
+            cells = scratch[:, :width]
+            np.add(columns, 1, out=cells, dtype=np.intp)
+            if per_employee:
+                cells *= width
+                cells += np.arange(width)
+                counts[:, first_employee:first_employee + width] = \
+                    np.bincount(cells.ravel(), minlength=num_codes * width).reshape(num_codes, width)
+            else:
+                cells += day_bins
+                counts += np.bincount(cells.ravel(), minlength=counts.size).reshape(counts.shape)
+        return counts
+
+    def employee_totals(self, shift_codes=('A', 'B', 'C', 'STANDBY_A', 'STANDBY_B', 'STANDBY_C', 'VACATION'),
+                        start=None, end=None):
+        """Per-employee day counts for each shift code over the archived months"""
+        code_slots = [self.shift_codes.index(shift_code) + 1 for shift_code in shift_codes]
+        totals = np.zeros((len(code_slots), len(self.employee_ids)), dtype=np.int64)
+        for entry in self.latest_months(start, end):
+            matrix = self.load_month(entry)
+            totals[:, :matrix.shape[1]] += self.count_month_codes(matrix, per_employee=True)[code_slots]
+
+        totals_df = pd.DataFrame(totals.T, columns=list(shift_codes))
+        totals_df.insert(0, 'Employee_ID', self.employee_ids)
+        return totals_df
+
+    def daily_coverage(self, shift_codes=('A', 'B', 'C', 'STANDBY_A', 'STANDBY_B', 'STANDBY_C', 'OFF', 'VACATION'),
+                       start=None, end=None):
+        """Per-day counts for each shift code across all archived months"""
+        code_slots = [self.shift_codes.index(shift_code) + 1 for shift_code in shift_codes]
+        dates = []
+        counts = []
+        for entry in self.latest_months(start, end):
+            matrix = self.load_month(entry)
+            dates.extend(entry['dates'])
+            counts.append(self.count_month_codes(matrix, per_employee=False)[:, code_slots])
+
+        coverage_df = pd.DataFrame(np.concatenate(counts) if counts else np.zeros((0, len(code_slots)), dtype=int),
+                                   columns=list(shift_codes))
+        coverage_df.insert(0, 'Date', pd.to_datetime(dates))
+        return coverage_df
+
+    def employee_history(self, employee_id, start=None, end=None):
+        """Day-by-day shifts of one employee across the archived months"""
+        key = self.employee_keys[str(employee_id)]
+        code_names = np.array(self.shift_codes + ['NOT_ROSTERED'])
+        dates = []
+        shifts = []
+        for entry in self.latest_months(start, end):
+            matrix = self.load_month(entry)
+            dates.extend(entry['dates'])
+            shifts.extend(code_names[matrix[:, key]] if key < matrix.shape[1] else ['NOT_ROSTERED'] * len(entry['dates']))
+        return pd.DataFrame({'Date': pd.to_datetime(dates), 'Shift': shifts})
 
 
 class ShiftRosterGenerator:
-    def __init__(self, excel_file_path, total_employees=2500):
+    def __init__(self, excel_file_path, total_employees=2500, demand_file_path=None):
         self.excel_file_path = excel_file_path
+        self.demand_file_path = demand_file_path
         self.total_employees = total_employees
         self.vacation_percentage = 0.1
         self.shifts = {
@@ -22,6 +265,34 @@ class ShiftRosterGenerator:
         self.min_consecutive_work_days = 5
         self.max_consecutive_work_days = 5
         self.standby_per_shift = 12
+        # Day 0 of the rotation clock; cycle phases run continuously from here across month boundaries
+        self.rotation_anchor_date = datetime(2025, 10, 1)
+        # Departments that only work 2 shifts (A/B)
+        self.two_shift_departments = ["Station Staff", "Supervisors"]
+        self.employee_registry = None
+        # Rotation offsets keyed by Employee_ID so phases survive rows being added or removed;
+        # optionally persisted to rotation_offsets_path between runs
+        self.rotation_offset_map = {}
+        self.rotation_offsets_path = None
+        # Per-row view of rotation_offset_map for the loaded employees
+        self.rotation_offsets = None
+        # Demand table (loaded once) and the (days, departments, shifts) target array for the current period
+        self.demand_table = None
+        self.demand_departments = None
+        self.demand_targets = None
+        # Integer codes used for compact roster matrices (snapshots, diffs)
+        self.shift_codes = ['A', 'B', 'C', 'OFF', 'STANDBY_A', 'STANDBY_B', 'STANDBY_C', 'VACATION',
+                            'ERROR_NO_SCHEDULE']
+        self.coverage_categories = {
+            'A_Shift': 'A',
+            'B_Shift': 'B',
+            'C_Shift': 'C',
+            'Standby_A': 'STANDBY_A',
+            'Standby_B': 'STANDBY_B',
+            'Standby_C': 'STANDBY_C',
+            'Days_Off': 'OFF',
+            'Vacation': 'VACATION'
+        }
 
     def load_employee_data(self):
         try:
@@ -125,6 +396,10 @@ class ShiftRosterGenerator:
             self.create_sample_employee_data()
             return False
 
+    def build_employee_registry(self):
+        self.employee_registry = EmployeeRegistry(self.employees_df, self.two_shift_departments)
+        return self.employee_registry
+
     def create_sample_employee_data(self):
         employee_ids = [f"EMP{str(i + 1).zfill(4)}" for i in range(self.total_employees)]
         employee_names = [f"Employee {i + 1}" for i in range(self.total_employees)]
@@ -163,38 +438,257 @@ class ShiftRosterGenerator:
     def calculate_employees_needed_per_shift(self, available_employees, total_days):
         cycle_length = 14
         work_days_per_cycle = 12
-        complete_cycles = total_days // cycle_length
-        remaining_days = total_days % cycle_length
         avg_working_per_day = (available_employees * work_days_per_cycle) // cycle_length
         employees_per_shift = max((avg_working_per_day // 3), 50)
         return employees_per_shift
 
+    def load_demand_table(self, demand_file_path):
+        """
+        Load a demand table (CSV or Excel) with a Shift and a Required column, plus a
+        day-of-week column (Mon..Sun) and/or a Date column for per-date overrides.
+        An optional Department column gives per-department targets.
+        """
+        print(f"Loading demand table: {demand_file_path}")
+        if str(demand_file_path).endswith('.csv'):
+            raw_df = pd.read_csv(demand_file_path)
+        else:
+            raw_df = pd.read_excel(demand_file_path)
+
+        def find_column(terms):
+            # Exact (case-insensitive) header match so e.g. 'Country' is never taken for 'count'
+            for col in raw_df.columns:
+                col_name = str(col).lower().strip().replace(' ', '_')
+                if col_name in terms:
+                    return col
+            return None
+
+        day_column = find_column(['day_of_week', 'dayofweek', 'weekday', 'day'])
+        date_column = find_column(['date'])
+        shift_column = find_column(['shift'])
+        dept_column = find_column(['department', 'dept', 'division', 'section'])
+        required_column = find_column(['required', 'demand', 'target', 'count'])
+
+        if shift_column is None or required_column is None or (day_column is None and date_column is None):
+            raise ValueError("Demand table needs Shift, Required and Day_Of_Week or Date columns")
+
+        weekday_names = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+        demand_df = pd.DataFrame({
+            'Shift': raw_df[shift_column].astype(str).str.strip().str.upper(),
+            'Required': pd.to_numeric(raw_df[required_column], errors='coerce').fillna(0).astype(int)
+        })
+        if day_column is not None:
+            demand_df['Day_Of_Week'] = raw_df[day_column].map(
+                lambda value: weekday_names.index(str(value).strip().lower()[:3])
+                if str(value).strip().lower()[:3] in weekday_names else -1)
+        else:
+            demand_df['Day_Of_Week'] = -1
+        if date_column is not None:
+            demand_df['Date'] = pd.to_datetime(raw_df[date_column], errors='coerce')
+        else:
+            demand_df['Date'] = pd.NaT
+        if dept_column is not None:
+            demand_df['Department'] = raw_df[dept_column].astype(str).str.strip()
+        else:
+            demand_df['Department'] = 'All'
+
+        bad_timing = (demand_df['Day_Of_Week'] < 0) & demand_df['Date'].isna()
+        bad_shift = ~demand_df['Shift'].isin(['A', 'B', 'C'])
+        if bad_timing.any():
+            print(f"WARNING: Ignored {int(bad_timing.sum())} demand rows with an unrecognised weekday or date")
+        if bad_shift.any():
+            print(f"WARNING: Ignored {int(bad_shift.sum())} demand rows with an unknown shift")
+
+        self.demand_table = demand_df[~bad_timing & ~bad_shift].reset_index(drop=True)
+        print(f"Loaded {len(self.demand_table)} demand rows")
+        return self.demand_table
+
+    def build_demand_targets(self, month_dates):
+        """Build the (days, departments, shifts) target array for a period from the demand table"""
+        departments = sorted(self.demand_table['Department'].unique())
+        targets = np.zeros((len(month_dates), len(departments), 3), dtype=np.int32)
+        weekdays = np.array([date.weekday() for date in month_dates])
+        date_positions = {date.date(): day_idx for day_idx, date in enumerate(month_dates)}
+
+        # Day-of-week rows first, then per-date overrides on top
+        for row in self.demand_table.itertuples(index=False):
+            if pd.isna(row.Date) and row.Day_Of_Week >= 0:
+                targets[weekdays == row.Day_Of_Week, departments.index(row.Department), 'ABC'.index(row.Shift)] = \
+                    row.Required
+        for row in self.demand_table.itertuples(index=False):
+            if not pd.isna(row.Date) and row.Date.date() in date_positions:
+                targets[date_positions[row.Date.date()], departments.index(row.Department), 'ABC'.index(row.Shift)] = \
+                    row.Required
+
+        self.demand_departments = departments
+        self.demand_targets = targets
+        return targets
+
+    def get_demand_groups(self):
+        """Demand department index for every employee, -1 where the department has no targets"""
+        registry = self.employee_registry
+        if self.demand_departments == ['All']:
+            return np.zeros(len(registry), dtype=np.int32)
+        lookup = np.array([self.demand_departments.index(name) if name in self.demand_departments else -1
+                           for name in registry.department_names] + [-1], dtype=np.int32)
+        return lookup[registry.department_codes]
+
+    def build_rotation_patterns(self, month_dates, two_shift):
+        """Shift index (0=A, 1=B, 2=C, -1=off) for every rotation offset and day, shape (cycle_length, days)"""
+        cycle_length = (2 if two_shift else 3) * (self.max_consecutive_work_days + 2)
+        generate_pattern = self.generate_2shift_pattern if two_shift else self.generate_3shift_pattern
+        shift_index = {'A': 0, 'B': 1, 'C': 2}
+        return np.array([[shift_index.get(shift, -1) for shift in generate_pattern(None, month_dates, offset)]
+                         for offset in range(cycle_length)], dtype=np.int8)
+
+    def calculate_demand_residual(self, shift_matrix, groups):
+        """
+        Coverage minus demand, shape (days, departments, shifts).
+        shift_matrix holds one row of shift indices (-1 when not working) per employee.
+        """
+        num_days, num_groups, num_shifts = self.demand_targets.shape
+        working = (shift_matrix >= 0) & (groups[:, None] >= 0)
+        employee_rows, day_idx = np.nonzero(working)
+        cells = (day_idx * num_groups + groups[employee_rows]) * num_shifts + shift_matrix[employee_rows, day_idx]
+        coverage = np.bincount(cells, minlength=num_days * num_groups * num_shifts)
+        return coverage.reshape(num_days, num_groups, num_shifts) - self.demand_targets
+
+    def optimize_rotation_offsets(self, month_dates, available_employees, max_passes=2):
+        """
+        Greedy local search over rotation offsets: move each employee to the offset that
+        most reduces total shortfall against the demand targets. Offsets are stored per
+        Employee_ID and carry over to later periods. A move is only allowed when the previous
+        period's trailing work run plus the new pattern's opening run stays within
+        max_consecutive_work_days, so the rotation stays valid across the period boundary.
+        """
+        registry = self.employee_registry
+        groups = self.get_demand_groups()
+        patterns = {two_shift: self.build_rotation_patterns(month_dates, two_shift) for two_shift in (False, True)}
+        # One-hot (offset, day, shift) coverage contribution of a single employee
+        contributions = {two_shift: np.stack([pattern == shift_idx for shift_idx in range(3)], axis=-1).astype(np.int32)
+                         for two_shift, pattern in patterns.items()}
+
+        # Work run each offset ends the previous period with, and opens this period with
+        boundary_days = self.max_consecutive_work_days + 1
+        previous_dates = self.get_date_range(month_dates[0] - timedelta(days=boundary_days), boundary_days)
+        trailing_runs = {}
+        opening_runs = {}
+        for two_shift, pattern in patterns.items():
+            previous_working = self.build_rotation_patterns(previous_dates, two_shift)[:, ::-1] >= 0
+            trailing_runs[two_shift] = np.where(previous_working.all(axis=1), boundary_days,
+                                                previous_working.argmin(axis=1))
+            opening_working = pattern[:, :boundary_days] >= 0
+            opening_runs[two_shift] = np.where(opening_working.all(axis=1), opening_working.shape[1],
+                                               opening_working.argmin(axis=1))
+
+        candidates = np.array([emp_idx for emp_idx in available_employees if groups[emp_idx] >= 0], dtype=np.int64)
+        if len(candidates) == 0:
+            return self.rotation_offsets
+
+        offsets = self.rotation_offsets
+        shift_matrix = np.empty((len(candidates), len(month_dates)), dtype=np.int8)
+        # Last period was worked with the offsets held before any move, so every pass checks against those
+        starting_trailing = np.empty(len(candidates), dtype=np.int64)
+        for two_shift, pattern in patterns.items():
+            rows = np.nonzero(registry.two_shift[candidates] == two_shift)[0]
+            starting_offsets = offsets[candidates[rows]] % len(pattern)
+            shift_matrix[rows] = pattern[starting_offsets]
+            starting_trailing[rows] = trailing_runs[two_shift][starting_offsets]
+        residual = self.calculate_demand_residual(shift_matrix, groups[candidates])
+        initial_shortfall = int(np.maximum(-residual, 0).sum())
+
+        for pass_idx in range(max_passes):
+            moved = 0
+            for candidate_idx, emp_idx in enumerate(candidates):
+                two_shift = bool(registry.two_shift[emp_idx])
+                contribution = contributions[two_shift]
+                group = groups[emp_idx]
+                current = offsets[emp_idx] % len(contribution)
+
+                # Residual without this employee, then shortfall for every candidate offset at once
+                base_residual = residual[:, group, :] - contribution[current]
+                shortfall = np.maximum(-(base_residual[None] + contribution), 0).sum(axis=(1, 2))
+                continuous = starting_trailing[candidate_idx] + opening_runs[two_shift] \
+                    <= self.max_consecutive_work_days
+                shortfall = np.where(continuous, shortfall, np.iinfo(shortfall.dtype).max)
+                best = int(shortfall.argmin())
+                if shortfall[best] < shortfall[current]:
+                    offsets[emp_idx] = best
+                    residual[:, group, :] = base_residual + contribution[best]
+                    moved += 1
+            if moved == 0:
+                break
+            print(f"  Offset pass {pass_idx + 1}: moved {moved} employees")
+
+        final_shortfall = int(np.maximum(-residual, 0).sum())
+        print(f"Demand shortfall (employee-shifts): {initial_shortfall} -> {final_shortfall}")
+
+        for emp_idx in candidates:
+            self.rotation_offset_map[str(registry.employee_ids[emp_idx])] = int(offsets[emp_idx])
+        self.save_rotation_offsets()
+        return offsets
+
+    def get_day_column(self, date):
+        # Roster column format: 'Day_Wed, 1-Oct-25'
+        return f"Day_{date.strftime('%a')}, {date.day}-{date.strftime('%b')}-{date.strftime('%y')}"
+
+    def get_date_range(self, start_date, num_days):
+        return [start_date + timedelta(days=day_idx) for day_idx in range(num_days)]
+
+    def assign_rotation_offsets(self):
+        """
+        Look up each loaded employee's rotation offset by Employee_ID.
+        Employees seen for the first time start from their row index, the original layout.
+        """
+        if not self.rotation_offset_map and self.rotation_offsets_path is not None \
+                and os.path.exists(self.rotation_offsets_path):
+            with open(self.rotation_offsets_path, encoding='utf-8') as offsets_file:
+                self.rotation_offset_map = json.load(offsets_file)
+
+        offsets = np.empty(self.total_employees, dtype=np.int64)
+        for emp_idx, employee_id in enumerate(self.employee_registry.employee_ids[:self.total_employees]):
+            offsets[emp_idx] = self.rotation_offset_map.setdefault(str(employee_id), emp_idx)
+        self.rotation_offsets = offsets
+        self.save_rotation_offsets()
+        return offsets
+
+    def save_rotation_offsets(self):
+        if self.rotation_offsets_path is None:
+            return
+        Path(self.rotation_offsets_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(self.rotation_offsets_path, 'w', encoding='utf-8') as offsets_file:
+            json.dump(self.rotation_offset_map, offsets_file)
+
+    def get_rotation_offset(self, emp_idx):
+        if self.rotation_offsets is None or emp_idx >= len(self.rotation_offsets):
+            return emp_idx
+        return int(self.rotation_offsets[emp_idx])
+
+    def get_cycle_phase(self, rotation_offset, date, cycle_length):
+        """Position in a rotation cycle on a date, in closed form from the anchor date"""
+        rotation_day = (date - self.rotation_anchor_date).days
+        return (rotation_offset + rotation_day) % cycle_length
+
     def generate_shift_pattern_for_employee(self, emp_idx, month_dates):
         """
         Generate pattern with:
         - 3 shifts (A/B/C) for most departments
         - 2 shifts (A/B) only for specific departments
         """
-        # Get employee department
-        if emp_idx < len(self.employees_df):
-            employee_department = self.employees_df.iloc[emp_idx]['Department']
-        else:
-            employee_department = 'General'
-
-        # Define which departments get only 2 shifts
-        special_departments = ["Station Staff", "Supervisors"]  # Change to your specific departments
+        if self.employee_registry is None:
+            self.build_employee_registry()
 
-        if employee_department in special_departments:
+        if emp_idx < len(self.employee_registry) and self.employee_registry.two_shift[emp_idx]:
             # 2-shift pattern for special departments
             return self.generate_2shift_pattern(emp_idx, month_dates)
         else:
             # 3-shift pattern for all other departments
             return self.generate_3shift_pattern(emp_idx, month_dates)
 
-    def generate_2shift_pattern(self, emp_idx, month_dates):
+    def generate_2shift_pattern(self, emp_idx, month_dates, rotation_offset=None):
         """Generate pattern with only 2 shifts (A/B) for special departments"""
         pattern = []
-        total_days = len(month_dates)
+        if rotation_offset is None:
+            rotation_offset = self.get_rotation_offset(emp_idx)
 
         # Create cycle with 2 shifts only
         base_cycle = []
@@ -203,7 +697,7 @@ class ShiftRosterGenerator:
         # Build cycle: each shift block followed by exactly 2 OFF days
         for shift_idx in range(2):
             # Determine shift type
-            current_shift = shifts[(emp_idx + shift_idx) % 2]
+            current_shift = shifts[(rotation_offset + shift_idx) % 2]
 
             # Fixed: Always use 5 consecutive work days (respecting max_consecutive_work_days)
             work_days = self.max_consecutive_work_days  # Always 5 days
@@ -214,21 +708,17 @@ class ShiftRosterGenerator:
             # Add exactly 2 OFF days after each shift block
             base_cycle.extend(['OFF', 'OFF'])
 
-        # Apply employee-specific offset for better distribution
-        cycle_offset = emp_idx % len(base_cycle)
-        offset_cycle = base_cycle[cycle_offset:] + base_cycle[:cycle_offset]
-
-        # Generate pattern for entire month
-        for day_idx in range(total_days):
-            cycle_pos = day_idx % len(offset_cycle)
-            pattern.append(offset_cycle[cycle_pos])
+        # Employee-specific offset plus the rotation clock gives the cycle position for any date
+        for date in month_dates:
+            pattern.append(base_cycle[self.get_cycle_phase(rotation_offset, date, len(base_cycle))])
 
         return pattern
 
-    def generate_3shift_pattern(self, emp_idx, month_dates):
+    def generate_3shift_pattern(self, emp_idx, month_dates, rotation_offset=None):
         """Generate pattern with 3 shifts (A/B/C) for regular departments"""
         pattern = []
-        total_days = len(month_dates)
+        if rotation_offset is None:
+            rotation_offset = self.get_rotation_offset(emp_idx)
 
         # Create improved cycle with guaranteed 2 OFF days after each shift block
         base_cycle = []
@@ -237,7 +727,7 @@ class ShiftRosterGenerator:
         # Build cycle: each shift block followed by exactly 2 OFF days
         for shift_idx in range(3):
             # Determine shift type
-            current_shift = shifts[(emp_idx + shift_idx) % 3]
+            current_shift = shifts[(rotation_offset + shift_idx) % 3]
 
             # Fixed: Always use 5 consecutive work days (respecting max_consecutive_work_days)
             work_days = self.max_consecutive_work_days  # Always 5 days
@@ -248,14 +738,9 @@ class ShiftRosterGenerator:
             # Add exactly 2 OFF days after each shift block
             base_cycle.extend(['OFF', 'OFF'])
 
-        # Apply employee-specific offset for better distribution
-        cycle_offset = emp_idx % len(base_cycle)
-        offset_cycle = base_cycle[cycle_offset:] + base_cycle[:cycle_offset]
-
-        # Generate pattern for entire month
-        for day_idx in range(total_days):
-            cycle_pos = day_idx % len(offset_cycle)
-            pattern.append(offset_cycle[cycle_pos])
+        # Employee-specific offset plus the rotation clock gives the cycle position for any date
+        for date in month_dates:
+            pattern.append(base_cycle[self.get_cycle_phase(rotation_offset, date, len(base_cycle))])
 
         return pattern
 
@@ -289,7 +774,24 @@ class ShiftRosterGenerator:
         standby_assignments = defaultdict(list)
         employee_standby_count = defaultdict(int)
 
-        for date in month_dates:
+        # With demand targets, standby is only taken from surplus so it never opens a shortfall
+        if self.demand_targets is not None:
+            demand_groups = self.get_demand_groups()
+            shift_index = {'A': 0, 'B': 1, 'C': 2}
+            shift_matrix = np.array([[shift_index.get(schedule[emp_idx][date], -1) for date in month_dates]
+                                     for emp_idx in available_employees], dtype=np.int8).reshape(-1, len(month_dates))
+            surplus = self.calculate_demand_residual(shift_matrix, demand_groups[available_employees])
+
+        def has_surplus(emp_idx, day_idx, shift):
+            if self.demand_targets is None or demand_groups[emp_idx] < 0:
+                return True
+            return surplus[day_idx, demand_groups[emp_idx], 'ABC'.index(shift)] > 0
+
+        def take_standby(emp_idx, day_idx, shift):
+            if self.demand_targets is not None and demand_groups[emp_idx] >= 0:
+                surplus[day_idx, demand_groups[emp_idx], 'ABC'.index(shift)] -= 1
+
+        for day_idx, date in enumerate(month_dates):
             # Determine which shifts to assign standby for this date
             # For most departments: A, B, C
             # For special department: only A, B
@@ -312,7 +814,8 @@ class ShiftRosterGenerator:
                     if standby_assigned >= self.standby_per_shift:
                         break
 
-                    if employee_standby_count[emp_idx] < 3:
+                    if employee_standby_count[emp_idx] < 3 and has_surplus(emp_idx, day_idx, shift):
+                        take_standby(emp_idx, day_idx, shift)
                         schedule[emp_idx][date] = f'STANDBY_{shift}'
                         standby_assignments[emp_idx].append((date, shift))
                         employee_standby_count[emp_idx] += 1
@@ -324,36 +827,75 @@ class ShiftRosterGenerator:
                                             emp not in [e for e, _ in standby_assignments.items() if any(
                                                 d == date and s == shift for d, s in standby_assignments[e])]]
 
-                    for emp_idx in additional_employees[:remaining]:
+                    for emp_idx in additional_employees:
+                        if remaining == 0:
+                            break
+                        if not has_surplus(emp_idx, day_idx, shift):
+                            continue
+                        take_standby(emp_idx, day_idx, shift)
+                        remaining -= 1
                         schedule[emp_idx][date] = f'STANDBY_{shift}'
                         standby_assignments[emp_idx].append((date, shift))
                         employee_standby_count[emp_idx] += 1
 
         return schedule, standby_assignments
 
-    def generate_monthly_roster(self, year, month):
-        print(f"Generating roster for {year}-{month:02d}")
-
+    def prepare_employees(self):
         loaded = self.load_employee_data()
         if not loaded:
             print("Failed to load employee data. Aborting.")
-            return None, None, None
+            return False
 
         self.total_employees = len(self.employees_df)
         print(f"Using actual employee count: {self.total_employees}")
+        self.build_employee_registry()
+        self.assign_rotation_offsets()
+
+        if self.demand_file_path is not None and self.demand_table is None:
+            self.load_demand_table(self.demand_file_path)
+        return True
+
+    def generate_monthly_roster(self, year, month):
+        print(f"Generating roster for {year}-{month:02d}")
+
+        if not self.prepare_employees():
+            return None, None, None
 
         month_dates = self.get_month_dates(year, month)
+        print(f"Month: {year}-{month:02d} ({len(month_dates)} days)")
+        return self.generate_roster_for_dates(month_dates)
+
+    def generate_roster_window(self, start_date, num_days=7):
+        """Generate any date window (week, month, quarter) directly from the rotation clock"""
+        print(f"Generating roster for {num_days} days from {start_date.strftime('%Y-%m-%d')}")
+
+        if not self.prepare_employees():
+            return None, None, None
+
+        return self.generate_roster_for_dates(self.get_date_range(start_date, num_days))
+
+    def generate_roster_for_dates(self, month_dates):
         vacation_employees = self.assign_vacation_employees()
         available_employees = [i for i in range(self.total_employees) if i not in vacation_employees]
 
         target_per_shift = self.calculate_employees_needed_per_shift(len(available_employees), len(month_dates))
 
-        print(f"Month: {year}-{month:02d} ({len(month_dates)} days)")
         print(f"Total employees: {self.total_employees}")
         print(f"Vacation employees: {len(vacation_employees)}")
         print(f"Available employees: {len(available_employees)}")
         print(f"Target employees per shift: {target_per_shift}")
 
+        if self.demand_table is not None:
+            self.build_demand_targets(month_dates)
+            average_targets = self.demand_targets.sum(axis=1).mean(axis=0)
+            print(f"Demand targets per day (avg): A:{average_targets[0]:.1f}, B:{average_targets[1]:.1f}, "
+                  f"C:{average_targets[2]:.1f}")
+            if self.rotation_offsets is None:
+                self.assign_rotation_offsets()
+            self.optimize_rotation_offsets(month_dates, available_employees)
+        else:
+            self.demand_targets = None
+
         schedule = {}
 
         for emp_idx in vacation_employees:
@@ -379,29 +921,24 @@ class ShiftRosterGenerator:
 
     def create_roster_dataframe(self, schedule, month_dates, year, month):
         roster_data = []
+        if self.employee_registry is None:
+            self.build_employee_registry()
+        registry = self.employee_registry
 
-        for emp_idx in range(self.total_employees):
-            emp_data = self.employees_df.iloc[emp_idx]
-
-            employee_id = emp_data.get('Employee_ID',
-                                       emp_data.get('ID', emp_data.get('employee_id', f'EMP{emp_idx + 1:04d}')))
-            employee_name = emp_data.get('Employee_Name',
-                                         emp_data.get('Name', emp_data.get('employee_name', f'Employee {emp_idx + 1}')))
-            department = emp_data.get('Department', emp_data.get('department', 'General'))
+        day_columns = [self.get_day_column(date) for date in month_dates]
 
+        for emp_idx in range(self.total_employees):
             row = {
-                'Employee_ID': employee_id,
-                'Employee_Name': employee_name,
-                'Department': department
+                'Employee_ID': str(registry.employee_ids[emp_idx]),
+                'Employee_Name': str(registry.employee_names[emp_idx]),
+                'Department': registry.department(emp_idx)
             }
 
-            for date in month_dates:
-                # Updated date format: 'Day_Wed, 1-Oct-25'
-                day_str = f"{date.strftime('%a')}, {date.day}-{date.strftime('%b')}-{date.strftime('%y')}"
+            for date, day_column in zip(month_dates, day_columns):
                 if emp_idx in schedule and date in schedule[emp_idx]:
-                    row[f'Day_{day_str}'] = schedule[emp_idx][date]
+                    row[day_column] = schedule[emp_idx][date]
                 else:
-                    row[f'Day_{day_str}'] = 'ERROR_NO_SCHEDULE'
+                    row[day_column] = 'ERROR_NO_SCHEDULE'
 
             monthly_schedule = []
             for date in month_dates:
@@ -425,35 +962,74 @@ class ShiftRosterGenerator:
 
         return pd.DataFrame(roster_data)
 
-    def analyze_consecutive_work_blocks(self, roster_df, month_dates):
-        """Analyze consecutive working days for each employee"""
+    def get_trailing_work_days(self, previous_roster, employee_ids, first_date):
+        """
+        Consecutive working days at the end of a previous roster, aligned to employee_ids.
+        The carry-in is ignored unless the previous roster ends the day before first_date.
+        """
+        previous = self.load_roster_for_diff(previous_roster)
+        expected_column = self.get_day_column(first_date - timedelta(days=1))
+        if not previous['day_columns'] or previous['day_columns'][-1] != expected_column:
+            last_column = previous['day_columns'][-1] if previous['day_columns'] else 'no days'
+            print(f"WARNING: Previous roster ends on {last_column}, expected {expected_column}. "
+                  f"Ignoring carry-in.")
+            return np.zeros(len(employee_ids), dtype=int)
+
+        work_codes = [self.shift_codes.index(shift) for shift in ['A', 'B', 'C']]
+        reversed_working = np.isin(previous['codes'], work_codes)[:, ::-1]
+        trailing = np.where(reversed_working.all(axis=1), reversed_working.shape[1],
+                            reversed_working.argmin(axis=1))
+
+        positions = pd.Index(previous['employee_ids']).get_indexer(np.asarray(employee_ids, dtype=str))
+        if len(trailing) == 0:
+            return np.zeros(len(positions), dtype=int)
+        return np.where(positions >= 0, trailing[positions], 0)
+
+    def analyze_consecutive_work_blocks(self, roster_df, month_dates, previous_roster=None):
+        """
+        Analyze consecutive working days for each employee.
+        previous_roster (DataFrame, workbook or .npz snapshot of the preceding period) lets
+        blocks that cross the period boundary be measured in full.
+        """
         consecutive_violations = []
         employee_stats = []
 
+        # Pull the columns out once instead of building a Series per employee
+        day_columns = []
+        for date in month_dates:
+            day_column = self.get_day_column(date)
+            if day_column in roster_df.columns:
+                day_columns.append(day_column)
+        employee_ids = roster_df['Employee_ID'].to_numpy()
+        employee_names = roster_df['Employee_Name'].to_numpy()
+        schedule_matrix = roster_df[day_columns].to_numpy().tolist()
+
+        if previous_roster is not None:
+            carry_in = self.get_trailing_work_days(previous_roster, employee_ids, month_dates[0])
+        else:
+            carry_in = np.zeros(len(roster_df), dtype=int)
+
         for emp_idx in range(len(roster_df)):
-            employee_id = roster_df.iloc[emp_idx]['Employee_ID']
-            employee_name = roster_df.iloc[emp_idx]['Employee_Name']
+            employee_id = employee_ids[emp_idx]
+            employee_name = employee_names[emp_idx]
 
             # Get employee's monthly schedule
-            schedule = []
-            for date in month_dates:
-                day_str = f"{date.strftime('%a')}, {date.day}-{date.strftime('%b')}-{date.strftime('%y')}"
-                day_column = f'Day_{day_str}'
-                if day_column in roster_df.columns:
-                    shift = roster_df.iloc[emp_idx][day_column]
-                    schedule.append(shift)
+            schedule = schedule_matrix[emp_idx]
 
             # Analyze consecutive work blocks
             work_blocks = []
             current_block_start = None
             current_block_length = 0
+            current_block_carry = 0
             current_shift = None
 
             for day_idx, shift in enumerate(schedule):
                 if shift in ['A', 'B', 'C']:  # Working day
                     if current_block_start is None:
+                        # A block on the first day continues the previous period's trailing block
+                        current_block_carry = int(carry_in[emp_idx]) if day_idx == 0 else 0
                         current_block_start = day_idx
-                        current_block_length = 1
+                        current_block_length = 1 + current_block_carry
                         current_shift = shift
                     else:
                         current_block_length += 1
@@ -463,8 +1039,8 @@ class ShiftRosterGenerator:
                 else:  # OFF, VACATION, or STANDBY day
                     if current_block_start is not None:
                         # End of work block
-                        start_date = month_dates[current_block_start]
-                        end_date = month_dates[current_block_start + current_block_length - 1]
+                        start_date = month_dates[current_block_start] - timedelta(days=current_block_carry)
+                        end_date = month_dates[current_block_start + current_block_length - current_block_carry - 1]
 
                         work_blocks.append({
                             'start_date': start_date.strftime('%d-%b'),
@@ -491,8 +1067,8 @@ class ShiftRosterGenerator:
 
             # Handle case where month ends with a work block
             if current_block_start is not None:
-                start_date = month_dates[current_block_start]
-                end_date = month_dates[current_block_start + current_block_length - 1]
+                start_date = month_dates[current_block_start] - timedelta(days=current_block_carry)
+                end_date = month_dates[current_block_start + current_block_length - current_block_carry - 1]
 
                 work_blocks.append({
                     'start_date': start_date.strftime('%d-%b'),
@@ -534,28 +1110,21 @@ class ShiftRosterGenerator:
         coverage_report = []
 
         for date in month_dates:
-            # Updated date format to match the roster columns
-            day_str = f"{date.strftime('%a')}, {date.day}-{date.strftime('%b')}-{date.strftime('%y')}"
-            day_column = f'Day_{day_str}'
+            day_column = self.get_day_column(date)
+            day_str = day_column[len('Day_'):]
 
             if day_column in roster_df.columns:
                 daily_assignments = roster_df[day_column].value_counts()
 
-                coverage_report.append({
-                    'Date': day_str,
-                    'A_Shift': daily_assignments.get('A', 0),
-                    'B_Shift': daily_assignments.get('B', 0),
-                    'C_Shift': daily_assignments.get('C', 0),
-                    'Standby_A': daily_assignments.get('STANDBY_A', 0),
-                    'Standby_B': daily_assignments.get('STANDBY_B', 0),
-                    'Standby_C': daily_assignments.get('STANDBY_C', 0),
-                    'Days_Off': daily_assignments.get('OFF', 0),
-                    'Vacation': daily_assignments.get('VACATION', 0)
-                })
+                report_row = {'Date': day_str}
+                for category, shift_code in self.coverage_categories.items():
+                    report_row[category] = daily_assignments.get(shift_code, 0)
+                coverage_report.append(report_row)
 
         return pd.DataFrame(coverage_report)
 
-    def save_roster_to_excel(self, roster_df, month_dates, year, month, output_path=None):
+    def save_roster_to_excel(self, roster_df, month_dates, year, month, output_path=None, previous_roster=None,
+                             executor=None):
         if output_path is None:
             documents_folder = Path.home() / "Documents"
             documents_folder.mkdir(exist_ok=True)
@@ -565,26 +1134,19 @@ class ShiftRosterGenerator:
             output_path = str(output_path)
             print(f"Saving roster to: {output_path}")
 
-        coverage_df = self.validate_daily_coverage(roster_df, month_dates)
+        # Coverage validation and block analysis don't depend on the roster sheet, so with
+        # an executor they run in the background while roster rows are written
+        coverage_future = run_stage(executor, self.validate_daily_coverage, roster_df, month_dates)
 
         # Analyze consecutive work blocks
         print("Analyzing consecutive work blocks...")
-        violations_df, employee_stats_df = self.analyze_consecutive_work_blocks(roster_df, month_dates)
+        analysis_future = run_stage(executor, self.analyze_consecutive_work_blocks, roster_df, month_dates,
+                                    previous_roster=previous_roster)
 
         try:
             with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-                roster_df.to_excel(writer, sheet_name='Monthly_Roster', index=False)
-                coverage_df.to_excel(writer, sheet_name='Daily_Coverage', index=False)
-                employee_stats_df.to_excel(writer, sheet_name='Consecutive_Days_Analysis', index=False)
-
-                # Only add violations sheet if there are violations
-                if not violations_df.empty:
-                    violations_df.to_excel(writer, sheet_name='Violations', index=False)
-
                 workbook = writer.book
-                roster_worksheet = writer.sheets['Monthly_Roster']
-                coverage_worksheet = writer.sheets['Daily_Coverage']
-                stats_worksheet = writer.sheets['Consecutive_Days_Analysis']
+                roster_worksheet = workbook.add_worksheet('Monthly_Roster')
 
                 header_format = workbook.add_format({
                     'bold': True,
@@ -622,14 +1184,27 @@ class ShiftRosterGenerator:
                     else:
                         roster_worksheet.set_column(col_num, col_num, 15)
 
-                for row_num in range(1, len(roster_df) + 1):
-                    for col_num, column in enumerate(roster_df.columns):
-                        if column.startswith('Day_'):
-                            cell_value = roster_df.iloc[row_num - 1, col_num]
-                            if cell_value in shift_formats:
-                                roster_worksheet.write(row_num, col_num, cell_value, shift_formats[cell_value])
-                            else:
-                                roster_worksheet.write(row_num, col_num, cell_value)
+                # Stream roster rows straight to the sheet, writing each cell once; only Day_ columns get shift formats
+                day_column_flags = [column.startswith('Day_') for column in roster_df.columns]
+                for row_num, row_values in enumerate(roster_df.itertuples(index=False, name=None), start=1):
+                    for col_num, cell_value in enumerate(row_values):
+                        if day_column_flags[col_num] and cell_value in shift_formats:
+                            roster_worksheet.write(row_num, col_num, cell_value, shift_formats[cell_value])
+                        else:
+                            roster_worksheet.write(row_num, col_num, cell_value)
+
+                coverage_df = coverage_future.result()
+                violations_df, employee_stats_df = analysis_future.result()
+
+                coverage_df.to_excel(writer, sheet_name='Daily_Coverage', index=False)
+                employee_stats_df.to_excel(writer, sheet_name='Consecutive_Days_Analysis', index=False)
+
+                # Only add violations sheet if there are violations
+                if not violations_df.empty:
+                    violations_df.to_excel(writer, sheet_name='Violations', index=False)
+
+                coverage_worksheet = writer.sheets['Daily_Coverage']
+                stats_worksheet = writer.sheets['Consecutive_Days_Analysis']
 
                 # Format Daily_Coverage sheet
                 for col_num, column in enumerate(coverage_df.columns):
@@ -647,14 +1222,11 @@ class ShiftRosterGenerator:
                         stats_worksheet.set_column(col_num, col_num, 15)
 
                 # Highlight violations in the analysis sheet
-                for row_num in range(1, len(employee_stats_df) + 1):
-                    max_consecutive = employee_stats_df.iloc[row_num - 1]['Max_Consecutive_Days']
-                    for col_num, column in enumerate(employee_stats_df.columns):
-                        cell_value = employee_stats_df.iloc[row_num - 1, col_num]
-                        if column == 'Max_Consecutive_Days' and max_consecutive > self.max_consecutive_work_days:
-                            stats_worksheet.write(row_num, col_num, cell_value, violation_format)
-                        else:
-                            stats_worksheet.write(row_num, col_num, cell_value)
+                if not employee_stats_df.empty:
+                    max_col_num = employee_stats_df.columns.get_loc('Max_Consecutive_Days')
+                    for row_num, row_values in enumerate(employee_stats_df.itertuples(index=False), start=1):
+                        if row_values[max_col_num] > self.max_consecutive_work_days:
+                            stats_worksheet.write(row_num, max_col_num, row_values[max_col_num], violation_format)
 
                 # Format Violations sheet if it exists
                 if not violations_df.empty:
@@ -726,12 +1298,517 @@ class ShiftRosterGenerator:
             print(f"Unexpected error saving file: {e}")
             raise
 
+    def save_roster_to_csv(self, roster_df, output_path):
+        roster_df.to_csv(output_path, index=False)
+        print(f"Roster CSV saved to: {output_path}")
+        return output_path
+
+    def save_roster_to_json(self, roster_df, month_dates, year, month, output_path):
+        """Write the roster as a compact JSON record matching the Prisma Roster model"""
+        day_columns = [column for column in roster_df.columns if str(column).startswith('Day_')]
+        shift_matrix = roster_df[day_columns].to_numpy().tolist()
+        employee_ids = roster_df['Employee_ID'].astype(str).tolist()
+
+        roster_record = {
+            'year': year,
+            'month': month,
+            'totalEmployees': len(roster_df),
+            'schedule': {
+                'dates': [date.strftime('%Y-%m-%d') for date in month_dates],
+                'employees': dict(zip(employee_ids, shift_matrix))
+            },
+            'summary': {
+                'aShifts': int(roster_df['A_Shifts'].sum()),
+                'bShifts': int(roster_df['B_Shifts'].sum()),
+                'cShifts': int(roster_df['C_Shifts'].sum()),
+                'workDays': int(roster_df['Total_Work_Days'].sum()),
+                'daysOff': int(roster_df['Days_Off'].sum()),
+                'standbyDays': int(roster_df['Total_Standby'].sum()),
+                'vacationEmployees': int((roster_df['Vacation_Days'] > 0).sum())
+            }
+        }
+
+        with open(output_path, 'w', encoding='utf-8') as json_file:
+            json.dump(roster_record, json_file, separators=(',', ':'))
+        print(f"Roster JSON saved to: {output_path}")
+        return output_path
+
+    def export_roster(self, roster_df, month_dates, year, month, output_dir=None, formats=('xlsx', 'csv', 'json'),
+                      previous_roster=None, parallel=True):
+        """
+        Write the roster in several formats from the same in-memory DataFrame.
+        With parallel=True, CSV/JSON writing and the workbook's coverage/block analysis run
+        on a thread pool while the workbook's roster sheet is written.
+        """
+        if output_dir is None:
+            output_dir = Path.home() / "Documents"
+            Path(output_dir).mkdir(exist_ok=True)
+        base_path = os.path.join(str(output_dir), f"Monthly_Roster_{year}_{month:02d}")
+
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=len(formats) + 1) if parallel else None
+        try:
+            futures = {}
+            if 'csv' in formats:
+                futures['csv'] = run_stage(executor, self.save_roster_to_csv, roster_df, base_path + '.csv')
+            if 'json' in formats:
+                futures['json'] = run_stage(executor, self.save_roster_to_json, roster_df, month_dates, year, month,
+                                            base_path + '.json')
+
+            # The workbook is written here while the other formats and its analysis run in the pool
+            if 'xlsx' in formats:
+                xlsx_path, coverage_df = self.save_roster_to_excel(roster_df, month_dates, year, month,
+                                                                   base_path + '.xlsx', previous_roster=previous_roster,
+                                                                   executor=executor)
+            else:
+                coverage_df = self.validate_daily_coverage(roster_df, month_dates)
+
+            results = {output_format: future.result() for output_format, future in futures.items()}
+            if 'xlsx' in formats:
+                results['xlsx'] = xlsx_path
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        mode = "parallel" if parallel else "sequential"
+        print(f"Exported {', '.join(formats)} in {time.perf_counter() - start:.2f}s ({mode})")
+        return results, coverage_df
+
+    def roster_to_code_matrix(self, roster_df):
+        """Convert the Day_ columns of a roster DataFrame into an int8 shift-code matrix"""
+        day_columns = [column for column in roster_df.columns if str(column).startswith('Day_')]
+        codes = np.empty((len(roster_df), len(day_columns)), dtype=np.int8)
+        for day_idx, column in enumerate(day_columns):
+            # Unknown values get code -1
+            codes[:, day_idx] = pd.Categorical(roster_df[column], categories=self.shift_codes).codes
+        return codes, day_columns
+
+    def save_roster_snapshot(self, roster_df, output_path):
+        """Save a compact binary snapshot (.npz) of a roster for later comparison"""
+        codes, day_columns = self.roster_to_code_matrix(roster_df)
+        np.savez_compressed(
+            output_path,
+            employee_ids=np.asarray(roster_df['Employee_ID'].astype(str), dtype=str),
+            employee_names=np.asarray(roster_df['Employee_Name'].astype(str), dtype=str),
+            day_columns=np.asarray(day_columns, dtype=str),
+            shift_codes=np.asarray(self.shift_codes, dtype=str),
+            codes=codes
+        )
+        print(f"Roster snapshot saved to: {output_path}")
+        return output_path
+
+    def load_roster_for_diff(self, roster_source):
+        """Load a roster DataFrame, workbook or .npz snapshot as ID/name arrays plus a code matrix"""
+        if isinstance(roster_source, pd.DataFrame):
+            roster_df = roster_source
+        elif str(roster_source).endswith('.npz'):
+            with np.load(roster_source) as snapshot:
+                codes = snapshot['codes']
+                # Remap codes in case the snapshot was written with a different code list
+                snapshot_codes = list(snapshot['shift_codes'])
+                if snapshot_codes != self.shift_codes:
+                    remap = np.array([self.shift_codes.index(code) if code in self.shift_codes else -1
+                                      for code in snapshot_codes] + [-1], dtype=np.int8)
+                    codes = remap[codes]
+                return {
+                    'employee_ids': snapshot['employee_ids'],
+                    'employee_names': snapshot['employee_names'],
+                    'day_columns': list(snapshot['day_columns']),
+                    'codes': codes
+                }
+        else:
+            roster_df = pd.read_excel(roster_source, sheet_name='Monthly_Roster')
+
+        codes, day_columns = self.roster_to_code_matrix(roster_df)
+        return {
+            'employee_ids': np.asarray(roster_df['Employee_ID'].astype(str), dtype=str),
+            'employee_names': np.asarray(roster_df['Employee_Name'].astype(str), dtype=str),
+            'day_columns': day_columns,
+            'codes': codes
+        }
+
+    def count_daily_coverage(self, codes):
+        """Per-day counts for each validate_daily_coverage category from a code matrix"""
+        coverage_counts = {}
+        for category, shift_code in self.coverage_categories.items():
+            coverage_counts[category] = (codes == self.shift_codes.index(shift_code)).sum(axis=0)
+        return coverage_counts
+
+    def find_consecutive_violations(self, codes):
+        """Return (row, end_day, length) arrays for work blocks longer than max_consecutive_work_days"""
+        work_codes = [self.shift_codes.index(shift) for shift in ['A', 'B', 'C']]
+        working = np.isin(codes, work_codes)
+
+        run_length = np.zeros(codes.shape, dtype=np.int16)
+        current_run = np.zeros(codes.shape[0], dtype=np.int16)
+        for day_idx in range(codes.shape[1]):
+            current_run = np.where(working[:, day_idx], current_run + 1, 0)
+            run_length[:, day_idx] = current_run
+
+        # A block ends on a working day that is followed by a non-working day (or the end of the roster)
+        block_end = working.copy()
+        block_end[:, :-1] &= ~working[:, 1:]
+
+        rows, end_days = np.nonzero(block_end & (run_length > self.max_consecutive_work_days))
+        return rows, end_days, run_length[rows, end_days]
+
+    def diff_rosters(self, old_roster, new_roster):
+        """
+        Compare two rosters (DataFrame, workbook path or .npz snapshot).
+        Employees are aligned by Employee_ID and days by roster column.
+        """
+        old = self.load_roster_for_diff(old_roster)
+        new = self.load_roster_for_diff(new_roster)
+
+        # Align employees and days
+        old_positions = pd.Index(old['employee_ids']).get_indexer(new['employee_ids'])
+        common_new = np.nonzero(old_positions >= 0)[0]
+        common_old = old_positions[common_new]
+        added_ids = new['employee_ids'][old_positions < 0]
+        removed_ids = old['employee_ids'][pd.Index(new['employee_ids']).get_indexer(old['employee_ids']) < 0]
+
+        old_day_set = set(old['day_columns'])
+        day_columns = [column for column in new['day_columns'] if column in old_day_set]
+        day_labels = np.array([column[len('Day_'):] for column in day_columns])
+        old_days = pd.Index(old['day_columns']).get_indexer(day_columns)
+        new_days = pd.Index(new['day_columns']).get_indexer(day_columns)
+
+        old_codes = old['codes'][:, old_days]
+        new_codes = new['codes'][:, new_days]
+
+        # Old roster laid out on the new roster's rows; added employees count as OFF
+        old_aligned = np.full(new_codes.shape, self.shift_codes.index('OFF'), dtype=np.int8)
+        old_aligned[common_new] = old_codes[common_old]
+
+        # Changed cells (employees present in both rosters)
+        code_names = np.array(self.shift_codes + ['UNKNOWN'])
+        changed = old_aligned != new_codes
+        changed[old_positions < 0] = False
+        changed_rows, changed_days = np.nonzero(changed)
+        changes_df = pd.DataFrame({
+            'Employee_ID': new['employee_ids'][changed_rows],
+            'Employee_Name': new['employee_names'][changed_rows],
+            'Date': day_labels[changed_days],
+            'Old_Shift': code_names[old_aligned[changed_rows, changed_days]],
+            'New_Shift': code_names[new_codes[changed_rows, changed_days]]
+        })
+
+        # Coverage deltas over the full rosters
+        old_coverage = self.count_daily_coverage(old_codes)
+        new_coverage = self.count_daily_coverage(new_codes)
+        coverage_delta = {'Date': day_labels}
+        for category in self.coverage_categories:
+            coverage_delta[f'{category}_Delta'] = new_coverage[category] - old_coverage[category]
+        coverage_delta_df = pd.DataFrame(coverage_delta)
+
+        # Consecutive-day violations present in the new roster but not in the old one
+        new_rows, new_end_days, new_lengths = self.find_consecutive_violations(new_codes)
+        old_rows, old_end_days, old_lengths = self.find_consecutive_violations(old_aligned)
+        max_length = len(day_columns) + 1
+        new_keys = (new_rows * len(day_columns) + new_end_days) * max_length + new_lengths
+        old_keys = (old_rows * len(day_columns) + old_end_days) * max_length + old_lengths
+        introduced = ~np.isin(new_keys, old_keys)
+        new_rows, new_end_days, new_lengths = new_rows[introduced], new_end_days[introduced], new_lengths[introduced]
+        new_violations_df = pd.DataFrame({
+            'Employee_ID': new['employee_ids'][new_rows],
+            'Employee_Name': new['employee_names'][new_rows],
+            'Block_Start': day_labels[new_end_days - new_lengths + 1],
+            'Block_End': day_labels[new_end_days],
+            'Consecutive_Days': new_lengths.astype(int),
+            'Violation': f"Exceeds {self.max_consecutive_work_days} days limit"
+        })
+
+        print(f"Changed cells: {len(changes_df)} across {changes_df['Employee_ID'].nunique()} employees")
+        print(f"Employees added: {len(added_ids)}, removed: {len(removed_ids)}")
+        print(f"New consecutive days violations: {len(new_violations_df)}")
+
+        return {
+            'changes': changes_df,
+            'coverage_delta': coverage_delta_df,
+            'new_violations': new_violations_df,
+            'added_employees': added_ids.tolist(),
+            'removed_employees': removed_ids.tolist()
+        }
+
+    def save_roster_diff_to_excel(self, roster_diff, output_path):
+        """Write a changes-only workbook from diff_rosters output"""
+        employee_changes_df = pd.DataFrame(
+            [{'Employee_ID': emp_id, 'Change': 'Added'} for emp_id in roster_diff['added_employees']] +
+            [{'Employee_ID': emp_id, 'Change': 'Removed'} for emp_id in roster_diff['removed_employees']],
+            columns=['Employee_ID', 'Change']
+        )
+        sheets = {
+            'Changes': roster_diff['changes'],
+            'Coverage_Delta': roster_diff['coverage_delta'],
+            'New_Violations': roster_diff['new_violations'],
+            'Employee_Changes': employee_changes_df
+        }
+
+        try:
+            with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
+                header_format = writer.book.add_format({
+                    'bold': True,
+                    'text_wrap': True,
+                    'valign': 'top',
+                    'fg_color': '#D7E4BC',
+                    'border': 1
+                })
+                for sheet_name, sheet_df in sheets.items():
+                    # Skip empty optional sheets, but always write the changes sheet
+                    if sheet_df.empty and sheet_name != 'Changes':
+                        continue
+                    sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+                    worksheet = writer.sheets[sheet_name]
+                    for col_num, column in enumerate(sheet_df.columns):
+                        worksheet.write(0, col_num, column, header_format)
+                        worksheet.set_column(col_num, col_num, 18)
+
+            print(f"Roster changes saved to: {output_path}")
+            return output_path
+
+        except PermissionError:
+            print("ERROR: Could not save file. Please close any open instance of Excel and try again.")
+            raise
+
+    def archive_roster(self, archive, roster_source, year, month):
+        """Add a roster (DataFrame, workbook or .npz snapshot) to a RosterArchive or archive directory"""
+        if not isinstance(archive, RosterArchive):
+            archive = RosterArchive(archive, self.shift_codes)
+
+        roster = self.load_roster_for_diff(roster_source)
+        codes = roster['codes']
+        if archive.shift_codes != self.shift_codes:
+            remap = np.array([archive.shift_codes.index(code) if code in archive.shift_codes else -1
+                              for code in self.shift_codes] + [-1], dtype=np.int8)
+            codes = remap[codes]
+
+        month_dates = self.get_month_dates(year, month)
+        if len(month_dates) != codes.shape[1]:
+            raise ValueError(f"Roster has {codes.shape[1]} days but {year}-{month:02d} has {len(month_dates)}")
+        archive.add_month(year, month, month_dates, roster['employee_ids'], codes)
+        return archive
+
+    def archive_existing_workbooks(self, archive, folder=None):
+        """Archive every Monthly_Roster_YYYY_MM workbook (or its .npz snapshot) not yet in the archive"""
+        if not isinstance(archive, RosterArchive):
+            archive = RosterArchive(archive, self.shift_codes)
+        if folder is None:
+            folder = Path.home() / "Documents"
+
+        for workbook_path in sorted(Path(folder).glob("Monthly_Roster_????_??.xlsx")):
+            year, month = (int(part) for part in workbook_path.stem.split('_')[-2:])
+            if archive.has_month(year, month):
+                continue
+            snapshot_path = workbook_path.with_suffix('.npz')
+            roster_source = str(snapshot_path) if snapshot_path.exists() else str(workbook_path)
+            print(f"Archiving {roster_source}")
+            self.archive_roster(archive, roster_source, year, month)
+        return archive
+
+
+def benchmark_employee_registry(total_employees=100000, sample_size=10000):
+    """Compare per-employee attribute access and memory: DataFrame.iloc vs EmployeeRegistry"""
+    print(f"\n=== EMPLOYEE REGISTRY BENCHMARK ({total_employees} employees) ===")
+    generator = ShiftRosterGenerator(None, total_employees)
+    generator.create_sample_employee_data()
+    employees_df = generator.employees_df
+
+    start = time.perf_counter()
+    registry = generator.build_employee_registry()
+    build_time = time.perf_counter() - start
+
+    # iloc is slow, so time it on a sample and report per-employee cost
+    sample = range(min(sample_size, total_employees))
+    start = time.perf_counter()
+    for emp_idx in sample:
+        emp_data = employees_df.iloc[emp_idx]
+        emp_data['Employee_ID'], emp_data['Employee_Name'], emp_data['Department']
+    iloc_time = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    for emp_idx in range(total_employees):
+        registry.employee_ids[emp_idx], registry.employee_names[emp_idx], registry.department(emp_idx)
+    registry_time = (time.perf_counter() - start) / total_employees
+
+    start = time.perf_counter()
+    for emp_idx in range(total_employees):
+        registry.record(emp_idx)
+    record_time = (time.perf_counter() - start) / total_employees
+
+    dataframe_memory = employees_df.memory_usage(deep=True).sum()
+    registry_memory = registry.memory_usage()
+
+    print(f"Registry build time: {build_time * 1000:.1f} ms")
+    print(f"DataFrame.iloc access: {iloc_time * 1e6:.2f} us/employee")
+    print(f"Registry array access: {registry_time * 1e6:.2f} us/employee ({iloc_time / registry_time:.0f}x faster)")
+    print(f"Registry record view: {record_time * 1e6:.2f} us/employee")
+    print(f"DataFrame memory: {dataframe_memory / 1024 ** 2:.1f} MB")
+    print(f"Registry memory: {registry_memory / 1024 ** 2:.1f} MB")
+
+
+def benchmark_export_pipeline(total_employees=40000, year=2025, month=10):
+    """End-to-end export wall time: parallel pipeline vs the sequential path"""
+    import tempfile
+
+    print(f"\n=== EXPORT PIPELINE BENCHMARK ({total_employees} employees) ===")
+    generator = ShiftRosterGenerator(None, total_employees)
+    generator.create_sample_employee_data()
+    generator.build_employee_registry()
+    month_dates = generator.get_month_dates(year, month)
+    schedule, month_dates, _ = generator.generate_roster_for_dates(month_dates)
+    roster_df = generator.create_roster_dataframe(schedule, month_dates, year, month)
+
+    timings = {}
+    for parallel in (False, True):
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            generator.export_roster(roster_df, month_dates, year, month, output_dir=output_dir, parallel=parallel)
+            timings[parallel] = time.perf_counter() - start
+
+    print(f"Sequential export: {timings[False]:.2f}s")
+    print(f"Parallel export: {timings[True]:.2f}s ({timings[False] / timings[True]:.2f}x)")
+
+
+def benchmark_demand_residual(total_employees=40000, repeats=20):
+    """Time full and incremental coverage-minus-demand residual evaluation"""
+    print(f"\n=== DEMAND RESIDUAL BENCHMARK ({total_employees} employees) ===")
+    generator = ShiftRosterGenerator(None, total_employees)
+    generator.create_sample_employee_data()
+    registry = generator.build_employee_registry()
+    month_dates = generator.get_month_dates(2025, 10)
+
+    weekday_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    generator.demand_table = pd.DataFrame([
+        {'Shift': shift, 'Required': total_employees // 5, 'Day_Of_Week': weekday, 'Date': pd.NaT,
+         'Department': department}
+        for weekday in range(len(weekday_names)) for shift in 'ABC' for department in registry.department_names
+    ])
+    generator.build_demand_targets(month_dates)
+    groups = generator.get_demand_groups()
+
+    pattern = generator.build_rotation_patterns(month_dates, two_shift=False)
+    shift_matrix = pattern[np.arange(total_employees) % len(pattern)]
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        residual = generator.calculate_demand_residual(shift_matrix, groups)
+    full_time = (time.perf_counter() - start) / repeats
+
+    # Incremental evaluation of every candidate offset for one employee, as the optimizer does
+    contribution = np.stack([pattern == shift_idx for shift_idx in range(3)], axis=-1).astype(np.int32)
+    sample = range(min(total_employees, 5000))
+    start = time.perf_counter()
+    for emp_idx in sample:
+        base_residual = residual[:, groups[emp_idx], :] - contribution[emp_idx % len(pattern)]
+        np.maximum(-(base_residual[None] + contribution), 0).sum(axis=(1, 2))
+    candidate_time = (time.perf_counter() - start) / len(sample)
+
+    print(f"Full residual evaluation: {full_time * 1000:.2f} ms")
+    print(f"Incremental evaluation ({len(pattern)} offsets): {candidate_time * 1e6:.1f} us/employee")
+    print(f"Estimated optimizer pass: {candidate_time * total_employees:.2f} s")
+
+
+def benchmark_roster_archive(total_employees=40000, years=5, start_year=2021):
+    """Build a multi-year archive and time aggregate queries over the mapped arrays"""
+    import tempfile
+
+    print(f"\n=== ROSTER ARCHIVE BENCHMARK ({years} years x {total_employees} employees) ===")
+    generator = ShiftRosterGenerator(None, total_employees)
+    employee_ids = [f"EMP{emp_idx + 1:05d}" for emp_idx in range(total_employees)]
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as archive_dir:
+        archive = RosterArchive(archive_dir, generator.shift_codes)
+        start = time.perf_counter()
+        for year in range(start_year, start_year + years):
+            for month in range(1, 13):
+                month_dates = generator.get_month_dates(year, month)
+                codes = rng.integers(0, 8, size=(total_employees, len(month_dates)), dtype=np.int8)
+                archive.add_month(year, month, month_dates, employee_ids, codes)
+        build_time = time.perf_counter() - start
+
+        archive = RosterArchive(archive_dir)
+        start = time.perf_counter()
+        totals_df = archive.employee_totals()
+        totals_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        coverage_df = archive.daily_coverage()
+        coverage_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        archive.employee_history(employee_ids[-1])
+        history_time = time.perf_counter() - start
+
+        archive_size = sum(path.stat().st_size for path in Path(archive_dir).iterdir())
+        print(f"Archive build: {build_time:.2f} s, {archive_size / 1024 ** 2:.0f} MB on disk")
+        print(f"Per-employee totals ({len(totals_df)} employees): {totals_time:.2f} s")
+        print(f"Per-day coverage ({len(coverage_df)} days): {coverage_time:.2f} s")
+        print(f"Single employee history: {history_time * 1000:.1f} ms")
+
+
+def check_demand_rotation_continuity(total_employees=600, months=(10, 11, 12), seed=2):
+    """Regression check: consecutive months with a per-department demand table keep the 5-on/2-off rule"""
+    import tempfile
+
+    print(f"\n=== DEMAND ROTATION CONTINUITY CHECK ({total_employees} employees) ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        employees_path = os.path.join(work_dir, 'employees')
+        departments = ['Operations', 'Station Staff', 'Security', 'Supervisors', 'Support']
+        pd.DataFrame({
+            'Employee_ID': [f"EMP{emp_idx + 1:04d}" for emp_idx in range(total_employees)],
+            'Employee_Name': [f"Employee {emp_idx + 1}" for emp_idx in range(total_employees)],
+            'Department': [departments[emp_idx % len(departments)] for emp_idx in range(total_employees)]
+        }).to_csv(employees_path + '.csv', index=False)
+
+        # Uneven demand per department and weekday, so later optimiser passes still move employees
+        rng = np.random.default_rng(seed)
+        demand_path = os.path.join(work_dir, 'demand.csv')
+        pd.DataFrame([
+            {'Department': department, 'Day_Of_Week': weekday, 'Shift': shift, 'Required': int(rng.integers(0, 60))}
+            for department in departments
+            for weekday in ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+            for shift in ['A', 'B', 'C']
+        ]).to_csv(demand_path, index=False)
+
+        generator = ShiftRosterGenerator(employees_path, total_employees, demand_path)
+        rosters = []
+        for month in months:
+            schedule, month_dates, _ = generator.generate_monthly_roster(2025, month)
+            rosters.append((generator.create_roster_dataframe(schedule, month_dates, 2025, month), month_dates))
+
+        passed = True
+        for (previous_df, _), (roster_df, month_dates), month in zip(rosters, rosters[1:], months[1:]):
+            violations_df, _ = generator.analyze_consecutive_work_blocks(roster_df, month_dates,
+                                                                         previous_roster=previous_df)
+            if violations_df.empty:
+                print(f"PASS: no consecutive-day violations into 2025-{month:02d}")
+            else:
+                print(f"FAIL: {len(violations_df)} consecutive-day violations into 2025-{month:02d}")
+                print(violations_df.to_string(index=False))
+                passed = False
+    return passed
+
+
+def run_checks():
+    return check_demand_rotation_continuity()
+
+
+def run_benchmarks():
+    benchmark_employee_registry()
+    benchmark_export_pipeline()
+    benchmark_demand_residual()
+    benchmark_roster_archive()
+
 
 def main():
     excel_file_path = r"C:\Users\a_abd\PyCharmMiscProject\generate_employee_list"
     total_employees = 2500
+    # Optional demand table (CSV/Excel: Day_Of_Week or Date, Shift, [Department], Required)
+    demand_file_path = None
 
-    generator = ShiftRosterGenerator(excel_file_path, total_employees)
+    generator = ShiftRosterGenerator(excel_file_path, total_employees, demand_file_path)
+    generator.rotation_offsets_path = str(Path.home() / "Documents" / "Roster_Rotation_Offsets.json")
 
     current_date = datetime.now()
     year = 2025
@@ -752,8 +1829,29 @@ def main():
         print("Creating roster DataFrame...")
         roster_df = generator.create_roster_dataframe(schedule, month_dates, year, month)
 
-        print("Saving Excel file...")
-        output_file, coverage_df = generator.save_roster_to_excel(roster_df, month_dates, year, month)
+        # Carry work blocks over from the previous month's snapshot, if there is one
+        previous_month_date = month_dates[0] - timedelta(days=1)
+        previous_snapshot = (Path.home() / "Documents" /
+                             f"Monthly_Roster_{previous_month_date.year}_{previous_month_date.month:02d}.npz")
+        previous_roster = str(previous_snapshot) if previous_snapshot.exists() else None
+
+        print("Saving roster files...")
+        output_files, coverage_df = generator.export_roster(roster_df, month_dates, year, month,
+                                                            previous_roster=previous_roster)
+        output_file = output_files['xlsx']
+
+        # Report what changed since the previous generation of this month, then refresh the snapshot
+        snapshot_file = os.path.splitext(output_file)[0] + '.npz'
+        if os.path.exists(snapshot_file):
+            print("Comparing with previous roster snapshot...")
+            roster_diff = generator.diff_rosters(snapshot_file, roster_df)
+            generator.save_roster_diff_to_excel(roster_diff, os.path.splitext(output_file)[0] + '_Changes.xlsx')
+        generator.save_roster_snapshot(roster_df, snapshot_file)
+
+        # Keep every generation in the append-only archive for multi-year analytics
+        archive_dir = Path(output_file).parent / "Roster_Archive"
+        archive = generator.archive_roster(archive_dir, roster_df, year, month)
+        generator.archive_existing_workbooks(archive, Path(output_file).parent)
 
         print("\n=== ROSTER SUMMARY ===")
         print(f"Total Employees: {len(roster_df)}")
@@ -787,4 +1885,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if '--benchmark' in sys.argv:
+        run_benchmarks()
+    elif '--check' in sys.argv:
+        sys.exit(0 if run_checks() else 1)
+    else:
+        main()